@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Bonistas Scraper Memory Benchmark
+Parses a saved bonistas.com page repeatedly (as a history backfill would) and
+reports wall time and peak memory for dict and compact bond representations
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from scrape_bonistas import BonistasScraper
+
+
+def run(content: bytes, pages: int, compact: bool):
+    """Parse `pages` copies of the fixture, keeping every bond; returns (bond count, seconds, peak bytes, retained bytes)"""
+    scraper = BonistasScraper(compact=compact)
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    bonds = []
+    for _ in range(pages):
+        bonds.extend(scraper.parse_page(content))
+
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(bonds), elapsed, peak, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark BonistasScraper memory usage on a saved page')
+    parser.add_argument('--fixture', '-f', type=str, default='bopreal_page.html',
+                       help='Saved bonistas.com page (default: bopreal_page.html)')
+    parser.add_argument('--pages', '-n', type=int, default=20,
+                       help='Number of times the page is parsed (default: 20)')
+
+    args = parser.parse_args()
+
+    with open(args.fixture, 'rb') as f:
+        content = f.read()
+
+    print(f"Fixture: {args.fixture} ({len(content) / 1024:.0f} KB), {args.pages} pages")
+    print(f"{'mode':<8} {'bonds':>7} {'time (s)':>9} {'peak (MB)':>10} {'retained (MB)':>14}")
+    for compact in (False, True):
+        count, elapsed, peak, retained = run(content, args.pages, compact)
+        mode = "compact" if compact else "dict"
+        print(f"{mode:<8} {count:>7} {elapsed:>9.2f} {peak / 2**20:>10.2f} {retained / 2**20:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
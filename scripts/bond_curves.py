@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Bond Yield Curves
+Fits a Nelson-Siegel(-Svensson) curve per bond group from data/bonds.json
+and answers "fair TIR at duration X" queries against it
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from export_bonistas_dataframe import load_bonds_data
+
+# Ticker family -> curve group. Bonistas pages list the whole market and the
+# scraper cannot tell currencies apart, so groups come from the instrument.
+# C/D suffixes are the cable/MEP settlement lines of the same bond.
+# Anything else (Lecaps/Boncaps, dollar-linked, provincial and corporate
+# bonds, equities) is left out of every curve.
+TICKER_GROUPS = [
+    ("USD", re.compile(r"^(GD|AL|AE)\d{2}[CD]?$")),
+    ("CER", re.compile(r"^(TX\d{2}|TZX(\d{2}|[A-Z]\d)|DICP|DIP0|PARP|PAP0|CUAP)$")),
+    ("BOPREAL", re.compile(r"^BP[A-Z0-9]{3}$")),
+]
+
+# Decay parameter grids searched for each fit (in years of duration)
+TAU_GRID = np.geomspace(0.1, 15.0, 40)
+TAU2_GRID = np.geomspace(0.5, 30.0, 25)
+
+# Minimum number of bonds required for each method
+MIN_POINTS = {"ns": 4, "nss": 6}
+
+# Durations closer than this (years) count as one point when choosing how
+# many curve factors the data can support
+DURATION_RESOLUTION = 1.0
+
+# Bumped whenever fitting changes so cached curves are refit
+CURVE_VERSION = 2
+
+
+def group_key(bond: Dict) -> Optional[str]:
+    """Curve group for a bond from its ticker family, or None if it belongs to no curve"""
+    ticker = (bond.get("ticker") or "").upper()
+    for group, pattern in TICKER_GROUPS:
+        if pattern.match(ticker):
+            return group
+    return None
+
+
+def _ns_loadings(t: np.ndarray, tau: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Nelson-Siegel slope and curvature loadings, stable at t == 0"""
+    x = np.asarray(t, dtype=float) / tau
+    safe = np.where(x == 0, 1.0, x)
+    slope = np.where(x == 0, 1.0, (1.0 - np.exp(-safe)) / safe)
+    curvature = slope - np.exp(-x)
+    return slope, curvature
+
+
+def _design_matrix(t: np.ndarray, taus: Tuple[float, ...], n_terms: int) -> np.ndarray:
+    """Level, slope, curvature (and second curvature) loadings, truncated to n_terms columns"""
+    t = np.asarray(t, dtype=float)
+    columns = [np.ones_like(t)]
+    slope, curvature = _ns_loadings(t, taus[0])
+    columns.extend([slope, curvature])
+    if len(taus) > 1:
+        columns.append(_ns_loadings(t, taus[1])[1])
+    return np.column_stack(columns[:n_terms])
+
+
+@dataclass(frozen=True)
+class CurveFit:
+    group: str
+    method: str
+    betas: Tuple[float, ...]
+    taus: Tuple[float, ...]
+    snapshot: str
+    n_points: int
+    rmse: float
+    min_duration: float = float("-inf")
+    max_duration: float = float("inf")
+
+    def evaluate(self, durations) -> np.ndarray:
+        """Fitted TIR (%) for an array of durations, held flat outside the fitted duration range"""
+        t = np.clip(np.atleast_1d(np.asarray(durations, dtype=float)), self.min_duration, self.max_duration)
+        return _design_matrix(t, self.taus, len(self.betas)) @ np.asarray(self.betas)
+
+    def to_dict(self) -> Dict:
+        return {
+            "group": self.group,
+            "method": self.method,
+            "betas": list(self.betas),
+            "taus": list(self.taus),
+            "snapshot": self.snapshot,
+            "n_points": self.n_points,
+            "rmse": self.rmse,
+            "min_duration": self.min_duration,
+            "max_duration": self.max_duration,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CurveFit":
+        return cls(
+            group=data["group"],
+            method=data["method"],
+            betas=tuple(data["betas"]),
+            taus=tuple(data["taus"]),
+            snapshot=data["snapshot"],
+            n_points=int(data["n_points"]),
+            rmse=float(data["rmse"]),
+            min_duration=float(data.get("min_duration", float("-inf"))),
+            max_duration=float(data.get("max_duration", float("inf"))),
+        )
+
+
+def fit_curve(durations: np.ndarray, tirs: np.ndarray, method: str = "ns") -> Tuple[Tuple[float, ...], Tuple[float, ...], float]:
+    """
+    Least-squares fit over a grid of decay parameters; returns (betas, taus, rmse).
+
+    Bonds bunched at a few durations cannot pin down every factor, so the
+    model keeps no more factors than there are distinct durations (to the
+    nearest DURATION_RESOLUTION), e.g. level + slope for a group quoted at
+    two maturities.
+    """
+    if method not in ("ns", "nss"):
+        raise ValueError(f"Unknown curve method: {method}")
+    distinct = len(np.unique(np.round(np.asarray(durations) / DURATION_RESOLUTION)))
+    n_terms = max(1, min(4 if method == "nss" else 3, distinct))
+
+    if n_terms == 4:
+        tau_sets = [(t1, t2) for t1 in TAU_GRID for t2 in TAU2_GRID if t2 > t1]
+    else:
+        tau_sets = [(t1,) for t1 in TAU_GRID]
+
+    best = None
+    for taus in tau_sets:
+        X = _design_matrix(durations, taus, n_terms)
+        betas, _, _, _ = np.linalg.lstsq(X, tirs, rcond=None)
+        sse = float(np.sum((X @ betas - tirs) ** 2))
+        if best is None or sse < best[2]:
+            best = (tuple(float(b) for b in betas), tuple(float(t) for t in taus), sse)
+
+    betas, taus, sse = best
+    return betas, taus, float(np.sqrt(sse / len(tirs)))
+
+
+def snapshot_hash(points: List[Tuple[str, float, float]], method: str) -> str:
+    """Stable hash of the (ticker, duration, tir) inputs for one group"""
+    payload = json.dumps([CURVE_VERSION, method, sorted(points)], separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class BondCurveService:
+    def __init__(self, method: str = "ns", cache_path: Optional[str] = None):
+        self.method = method
+        self.cache_path = cache_path
+        self.fits: Dict[str, CurveFit] = {}
+        self.points: Dict[str, List[Tuple[str, float, float]]] = {}
+        self._source_stamp = None
+        if cache_path:
+            self._load_cache()
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.fits = {g: CurveFit.from_dict(fit) for g, fit in data.get("curves", {}).items()}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading curve cache: {e}")
+
+    def _save_cache(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump({"curves": {g: fit.to_dict() for g, fit in self.fits.items()}}, f, indent=2)
+        except Exception as e:
+            print(f"Error saving curve cache: {e}")
+
+    def update(self, bonds: List[Dict]) -> List[str]:
+        """Group bonds and refit only the groups whose inputs changed; returns refitted groups"""
+        groups: Dict[str, List[Tuple[str, float, float]]] = {}
+        for bond in bonds:
+            duration, tir = bond.get("duration"), bond.get("tir")
+            group = group_key(bond)
+            if group is None or duration is None or tir is None or duration < 0:
+                continue
+            groups.setdefault(group, []).append((bond.get("ticker") or "", float(duration), float(tir)))
+
+        refitted = []
+        fitted = set()
+        for group, points in groups.items():
+            if len(points) < MIN_POINTS[self.method]:
+                print(f"Skipping {group}: {len(points)} bonds, need {MIN_POINTS[self.method]}")
+                continue
+            fitted.add(group)
+            snapshot = snapshot_hash(points, self.method)
+            self.points[group] = points
+            cached = self.fits.get(group)
+            if cached and cached.snapshot == snapshot:
+                continue
+            durations = np.array([p[1] for p in points])
+            tirs = np.array([p[2] for p in points])
+            betas, taus, rmse = fit_curve(durations, tirs, self.method)
+            self.fits[group] = CurveFit(group, self.method, betas, taus, snapshot, len(points), rmse,
+                                        float(durations.min()), float(durations.max()))
+            refitted.append(group)
+
+        # Drop curves for groups that disappeared or no longer have enough bonds
+        removed = set(self.fits) - fitted
+        for group in removed:
+            del self.fits[group]
+        for group in set(self.points) - fitted:
+            del self.points[group]
+
+        if self.cache_path and (refitted or removed):
+            self._save_cache()
+        return refitted
+
+    def refresh(self, file_path: str = "data/bonds.json") -> List[str]:
+        """Reload bonds from disk only when the file changed since the last call"""
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            print(f"Error: {file_path} not found. Run scrape_bonistas.py first.")
+            return []
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._source_stamp:
+            return []
+        refitted = self.update(load_bonds_data(file_path))
+        self._source_stamp = stamp
+        return refitted
+
+    def groups(self) -> List[str]:
+        return sorted(self.fits)
+
+    def curve(self, group: str) -> CurveFit:
+        if group not in self.fits:
+            raise KeyError(f"No curve fitted for group {group!r}")
+        return self.fits[group]
+
+    def evaluate(self, group: str, durations) -> np.ndarray:
+        """Fair TIR (%) at each duration, in one vectorized call"""
+        return self.curve(group).evaluate(durations)
+
+    def residuals(self, group: str, durations, tirs) -> np.ndarray:
+        """Observed minus fair TIR (%) for arrays of (duration, tir)"""
+        return np.asarray(tirs, dtype=float) - self.evaluate(group, durations)
+
+    def bond_residuals(self, group: str) -> pd.DataFrame:
+        """Fair TIR and residual for every bond used to fit the group"""
+        points = self.points.get(group, [])
+        df = pd.DataFrame(points, columns=["ticker", "duration", "tir"])
+        if df.empty:
+            return df
+        df["fair_tir"] = self.evaluate(group, df["duration"].to_numpy())
+        df["residual"] = df["tir"] - df["fair_tir"]
+        return df
+
+    def evaluate_all(self, durations) -> pd.DataFrame:
+        """Fair TIR for every fitted group at the given durations"""
+        durations = np.atleast_1d(np.asarray(durations, dtype=float))
+        data = {group: fit.evaluate(durations) for group, fit in sorted(self.fits.items())}
+        return pd.DataFrame(data, index=pd.Index(durations, name="duration"))
+
+
+def check_fixture_groups(fixture_path: str = "bopreal_page.html") -> bool:
+    """Parse a saved bonistas.com page and check CER, BOPREAL and USD bonds land in separate groups"""
+    from scrape_bonistas import BonistasScraper
+
+    with open(fixture_path, 'rb') as f:
+        bonds = BonistasScraper().parse_page(f.read())
+
+    groups: Dict[str, set] = {}
+    for bond in bonds:
+        groups.setdefault(group_key(bond), set()).add(bond["ticker"])
+
+    expected = {"CER": {"TX26", "TZX26", "DICP"}, "BOPREAL": {"BPOA7", "BPY26"}, "USD": {"GD30", "AL30D"}}
+    excluded = {"S31L5", "T15D5", "BDC28", "TZV26", "YMCXD", "MELI"}
+    ok = True
+    for group, tickers in expected.items():
+        missing = tickers - groups.get(group, set())
+        if missing:
+            print(f"FAIL {group}: {sorted(missing)} not grouped as {group}")
+            ok = False
+    leaked = excluded - groups.get(None, set())
+    if leaked:
+        print(f"FAIL excluded instruments assigned to a curve: {sorted(leaked)}")
+        ok = False
+    for group in ("CER", "BOPREAL", "USD"):
+        print(f"  {group}: {len(groups.get(group, ()))} tickers")
+    print(f"  excluded: {len(groups.get(None, ()))} tickers")
+    print("Fixture grouping OK" if ok else "Fixture grouping FAILED")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit yield curves per bond group from Bonistas data')
+    parser.add_argument('--input', '-i', type=str, default='data/bonds.json',
+                       help='Input JSON file path (default: data/bonds.json)')
+    parser.add_argument('--method', '-m', choices=['ns', 'nss'], default='ns',
+                       help='Nelson-Siegel (ns) or Nelson-Siegel-Svensson (nss)')
+    parser.add_argument('--cache', type=str, default='data/bond_curves.json',
+                       help='Fitted curve cache (default: data/bond_curves.json)')
+    parser.add_argument('--durations', '-d', type=float, nargs='+', default=[0.5, 1, 2, 3, 5, 7, 10],
+                       help='Durations to evaluate the curves at')
+    parser.add_argument('--residuals', action='store_true', help='Print per-bond residuals')
+    parser.add_argument('--check-fixture', type=str, nargs='?', const='bopreal_page.html', default=None,
+                       help='Only check ticker grouping on a saved bonistas page (default: bopreal_page.html)')
+
+    args = parser.parse_args()
+
+    if args.check_fixture:
+        sys.exit(0 if check_fixture_groups(args.check_fixture) else 1)
+
+    service = BondCurveService(method=args.method, cache_path=args.cache)
+    refitted = service.refresh(args.input)
+    print(f"Curves: {len(service.groups())} ({len(refitted)} refitted)")
+    for group in service.groups():
+        fit = service.curve(group)
+        print(f"  {group}: {fit.n_points} bonds, RMSE {fit.rmse:.3f}")
+
+    if not service.groups():
+        print("No curves could be fitted.")
+        return
+
+    print("\nFair TIR (%) by duration:")
+    print(service.evaluate_all(args.durations).round(2).to_string())
+
+    if args.residuals:
+        for group in service.groups():
+            print(f"\n{group} residuals:")
+            print(service.bond_residuals(group).round(2).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,17 @@
 # cafci_tna_full.py
 # -*- coding: utf-8 -*-
 
+import argparse
 import io
 import os
 import re
+import sys
 import time
 import requests
 import pandas as pd
 
+from single_flight import SingleFlight, COALESCED_EXIT_CODE
+
 # ----------------------------
 # Config
 # ----------------------------
@@ -241,63 +245,91 @@ def procesar_categoria(nombre, dicc, tipo="monthYear", plot=False, color="orange
 
     return df
 
+# ----------------------------
+# FONDOS
+# ----------------------------
+FONDOS_MONEY_MARKET = {
+    "Schroder Liquidez - Clase B": (1343, 3831),
+    "MAF Liquidez - Clase A": (1500, 4486),
+    "Chaco FCI Money Market - Clase A": (1465, 4332),
+    "Delta Pesos - Clase X": (394, 3919),
+    "Balanz Capital Money Market - Clase A": (1213, 3355),
+    "Mercado Fondo - Clase A": (798, 1982),
+    "Cocos Ahorro - Clase A": (1469, 4337),
+    "IOL Dólar Ahorro Plus - Clase D": (1570, 5100),
+}
+
+FONDOS_RENTA_FIJA = {
+    "MAF Ahorro Plus - Clase C": (655, 1354),
+    "Compass Opportunity - Clase F": (317, 1867),
+    "Compass Renta Fija III - Clase F": (429, 1879),
+    "IOL Dólar Ahorro Plus - Clase C": (1570, 5099),
+}
+
+FONDOS_RENTA_VARIABLE = {
+    "Alpha Latam - Clase A": (1235, 3422),
+    "Fima Acciones Latinoamerica - Clase A": (851, 2426),
+    "Delta Select - Clase G": (419, 1926),
+    "Alpha Latam - Clase Q Ley N° 27.743": (1235, 5036),
+}
+
+FONDOS_RENTA_MIXTA = {
+    "Schroder Retorno Absoluto Dólares - Clase B": (555, 2199),
+    "Delta Multimercado I - Clase G": (466, 1922),
+    "Gainvest Balanceado - Clase E": (545, 2638),
+    "Alpha Renta Balanceada Global - Clase D": (502, 1838),
+    "Alpha Retorno Total - Clase I": (184, 1848),
+    "Gainvest Balanceado - Clase F": (545, 2639),
+}
+
+# Categoría -> { 'Nombre de la Clase': (fondoId, claseId), ... }
+CATEGORIAS = {
+    "Money Market": FONDOS_MONEY_MARKET,
+    "Renta Fija": FONDOS_RENTA_FIJA,
+    "Renta Variable": FONDOS_RENTA_VARIABLE,
+    "Renta Mixta": FONDOS_RENTA_MIXTA,
+}
+
 # ----------------------------
 # PRUEBA CON TUS LISTAS
 # ----------------------------
-if __name__ == "__main__":
-    # --- FONDOS ---
-    fondos_money_market = {
-        "Schroder Liquidez - Clase B": (1343, 3831),
-        "MAF Liquidez - Clase A": (1500, 4486),
-        "Chaco FCI Money Market - Clase A": (1465, 4332),
-        "Delta Pesos - Clase X": (394, 3919),
-        "Balanz Capital Money Market - Clase A": (1213, 3355),
-        "Mercado Fondo - Clase A": (798, 1982),
-        "Cocos Ahorro - Clase A": (1469, 4337),
-        "IOL Dólar Ahorro Plus - Clase D": (1570, 5100),
-    }
-
-    fondos_renta_fija = {
-        "MAF Ahorro Plus - Clase C": (655, 1354),
-        "Compass Opportunity - Clase F": (317, 1867),
-        "Compass Renta Fija III - Clase F": (429, 1879),
-        "IOL Dólar Ahorro Plus - Clase C": (1570, 5099),
-    }
-
-    fondos_renta_variable = {
-        "Alpha Latam - Clase A": (1235, 3422),
-        "Fima Acciones Latinoamerica - Clase A": (851, 2426),
-        "Delta Select - Clase G": (419, 1926),
-        "Alpha Latam - Clase Q Ley N° 27.743": (1235, 5036),
-    }
-
-    fondos_renta_mixta = {
-        "Schroder Retorno Absoluto Dólares - Clase B": (555, 2199),
-        "Delta Multimercado I - Clase G": (466, 1922),
-        "Gainvest Balanceado - Clase E": (545, 2638),
-        "Alpha Renta Balanceada Global - Clase D": (502, 1838),
-        "Alpha Retorno Total - Clase I": (184, 1848),
-        "Gainvest Balanceado - Clase F": (545, 2639),
-    }
-
-    # Ejecutar cada categoría (sin gráficos para correr rápido)
-    df_mm = procesar_categoria("Money Market", fondos_money_market, tipo="monthYear", plot=False)
-    df_rf = procesar_categoria("Renta Fija", fondos_renta_fija, tipo="monthYear", plot=False)
-    df_rv = procesar_categoria("Renta Variable", fondos_renta_variable, tipo="monthYear", plot=False)
-    df_rm = procesar_categoria("Renta Mixta", fondos_renta_mixta, tipo="monthYear", plot=False)
-
-    # Unir todo en un solo DataFrame y guardar
-    df_all = pd.concat([
-        df_mm.assign(categoria="Money Market"),
-        df_rf.assign(categoria="Renta Fija"),
-        df_rv.assign(categoria="Renta Variable"),
-        df_rm.assign(categoria="Renta Mixta"),
-    ], ignore_index=True)
-
-    print("\nResumen combinado (primeras filas):")
-    print(df_all.head(12).to_string(index=False))
+def main():
+    parser = argparse.ArgumentParser(description="TNA y rendimiento mensual de FCIs desde CAFCI")
+    parser.add_argument("--lock-timeout", type=float, default=300,
+                        help="Segundos a esperar si otra corrida está actualizando el CSV (default: 300)")
+    parser.add_argument("--report-coalesced", action="store_true",
+                        help=f"Salir con código {COALESCED_EXIT_CODE} si se reutilizó el CSV de otra corrida")
+    args = parser.parse_args()
 
     # Guardar CSV con rutas relativas basadas en la raíz del proyecto
     outfile = os.path.join(os.getcwd(), "data", "fondos_tna_rendimiento.csv")
-    df_all.to_csv(outfile, index=False, encoding="utf-8")
-    print(f"\nArchivo guardado: {outfile}")
+
+    # Una sola corrida a la vez: si otra ya está bajando los datos, esperarla y reutilizar su CSV
+    with SingleFlight(outfile, timeout=args.lock_timeout) as flight:
+        if flight.coalesced:
+            print(f"\nArchivo actualizado por otra corrida, se reutiliza: {outfile}")
+            sys.exit(flight.exit_code(args.report_coalesced))
+
+        # Ejecutar cada categoría (sin gráficos para correr rápido)
+        df_mm = procesar_categoria("Money Market", FONDOS_MONEY_MARKET, tipo="monthYear", plot=False)
+        df_rf = procesar_categoria("Renta Fija", FONDOS_RENTA_FIJA, tipo="monthYear", plot=False)
+        df_rv = procesar_categoria("Renta Variable", FONDOS_RENTA_VARIABLE, tipo="monthYear", plot=False)
+        df_rm = procesar_categoria("Renta Mixta", FONDOS_RENTA_MIXTA, tipo="monthYear", plot=False)
+
+        # Unir todo en un solo DataFrame y guardar
+        df_all = pd.concat([
+            df_mm.assign(categoria="Money Market"),
+            df_rf.assign(categoria="Renta Fija"),
+            df_rv.assign(categoria="Renta Variable"),
+            df_rm.assign(categoria="Renta Mixta"),
+        ], ignore_index=True)
+
+        print("\nResumen combinado (primeras filas):")
+        print(df_all.head(12).to_string(index=False))
+
+        df_all.to_csv(outfile, index=False, encoding="utf-8")
+        print(f"\nArchivo guardado: {outfile}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Export Stock History to a Columnar Store
+Converts data/stocks/*.json OHLCV arrays into one .npy file per column plus
+a symbol/date index, so readers can memory-map and slice without parsing JSON
+"""
+
+import argparse
+import glob
+import io
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = {
+    "date": "datetime64[ms]",
+    "open": "float64",
+    "high": "float64",
+    "low": "float64",
+    "close": "float64",
+    "volume": "float64",
+}
+INDEX_FILE = "index.json"
+
+
+def _column_path(store_dir: str, column: str) -> str:
+    return os.path.join(store_dir, f"{column}.npy")
+
+
+def _to_datetime64(value) -> np.datetime64:
+    """'2020-06-18T13:30:00.000Z', date or Timestamp -> naive datetime64[ms] (UTC)"""
+    if value is None:
+        return np.datetime64("NaT", "ms")
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert(None)
+    return np.datetime64(timestamp, "ms")
+
+
+def load_symbol_bars(file_path: str, after: Optional[np.datetime64] = None) -> Dict[str, np.ndarray]:
+    """Parse one data/stocks JSON file into column arrays, keeping bars newer than `after`"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        bars = json.load(f)
+
+    dates = pd.to_datetime([b.get("date") for b in bars], utc=True, errors="coerce")
+    columns = {"date": dates.tz_convert(None).to_numpy(dtype=COLUMNS["date"])}
+    for name, dtype in COLUMNS.items():
+        if name != "date":
+            columns[name] = np.array([np.nan if b.get(name) is None else b.get(name) for b in bars], dtype=dtype)
+    keep = ~np.isnat(columns["date"])
+    if after is not None:
+        keep &= columns["date"] > after
+    order = np.argsort(columns["date"][keep], kind="stable")
+    return {name: values[keep][order] for name, values in columns.items()}
+
+
+def _append_npy(path: str, values: np.ndarray):
+    """Append rows to a 1-D .npy file in place, rewriting only its header"""
+    if not os.path.exists(path):
+        np.save(path, values)
+        return
+
+    with open(path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        header_len = f.tell()
+
+        header = io.BytesIO()
+        new_header = {
+            "descr": np.lib.format.dtype_to_descr(dtype),
+            "fortran_order": fortran_order,
+            "shape": (shape[0] + len(values),),
+        }
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(header, new_header)
+        else:
+            np.lib.format.write_array_header_2_0(header, new_header)
+
+        if len(header.getvalue()) == header_len:
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+            f.seek(0)
+            f.write(header.getvalue())
+            return
+
+    # Header grew past its reserved padding: fall back to a full rewrite
+    existing = np.load(path)
+    np.save(path, np.concatenate([existing, values.astype(existing.dtype)]))
+
+
+def _load_index(store_dir: str) -> Dict:
+    try:
+        with open(os.path.join(store_dir, INDEX_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"rows": 0, "symbols": {}}
+
+
+def _save_index(store_dir: str, index: Dict):
+    path = os.path.join(store_dir, INDEX_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _store_is_consistent(store_dir: str, index: Dict) -> bool:
+    """True if every column file holds exactly the rows the index knows about"""
+    for column in COLUMNS:
+        path = _column_path(store_dir, column)
+        if not os.path.exists(path):
+            return index["rows"] == 0
+        if len(np.load(path, mmap_mode="r")) != index["rows"]:
+            return False
+    return True
+
+
+def export_stocks(input_dir: str = "data/stocks", store_dir: str = "data/stocks-columnar",
+                  rebuild: bool = False) -> Dict[str, int]:
+    """Append new bars from every JSON file to the columnar store; returns bars added per symbol"""
+    os.makedirs(store_dir, exist_ok=True)
+    index = _load_index(store_dir)
+
+    if rebuild or not _store_is_consistent(store_dir, index):
+        if not rebuild:
+            print("Store is out of sync with its index, rebuilding...")
+        for column in COLUMNS:
+            if os.path.exists(_column_path(store_dir, column)):
+                os.remove(_column_path(store_dir, column))
+        index = {"rows": 0, "symbols": {}}
+
+    added = {}
+    for file_path in sorted(glob.glob(os.path.join(input_dir, "*.json"))):
+        symbol = os.path.splitext(os.path.basename(file_path))[0]
+        stat = os.stat(file_path)
+        entry = index["symbols"].get(symbol)
+
+        # Unchanged source file: nothing new to parse
+        if entry and entry["source_mtime_ns"] == stat.st_mtime_ns and entry["source_size"] == stat.st_size:
+            continue
+
+        try:
+            after = np.datetime64(entry["last_date"], "ms") if entry else None
+            bars = load_symbol_bars(file_path, after=after)
+        except Exception as e:
+            print(f"Error reading {file_path}: {e}")
+            continue
+
+        count = len(bars["date"])
+        if count:
+            for column, values in bars.items():
+                _append_npy(_column_path(store_dir, column), values)
+            if entry is None:
+                entry = {"segments": [], "first_date": str(bars["date"][0])}
+            entry["segments"].append([index["rows"], count])
+            entry["last_date"] = str(bars["date"][-1])
+            index["rows"] += count
+            added[symbol] = count
+
+        if entry is not None:
+            entry["source_mtime_ns"] = stat.st_mtime_ns
+            entry["source_size"] = stat.st_size
+            index["symbols"][symbol] = entry
+
+    index["columns"] = list(COLUMNS)
+    _save_index(store_dir, index)
+    return added
+
+
+class StockColumnarStore:
+    """Read-only, memory-mapped view over a store written by export_stocks()"""
+
+    def __init__(self, store_dir: str = "data/stocks-columnar"):
+        self.store_dir = store_dir
+        self.index = _load_index(store_dir)
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def column(self, name: str) -> np.ndarray:
+        if name not in self._columns:
+            self._columns[name] = np.load(_column_path(self.store_dir, name), mmap_mode="r")
+        return self._columns[name]
+
+    def symbols(self) -> List[str]:
+        return sorted(self.index["symbols"])
+
+    def _row_slices(self, symbol: str, start=None, end=None) -> List[slice]:
+        """Row ranges for a symbol with start <= date <= end, without copying data"""
+        entry = self.index["symbols"].get(symbol)
+        if entry is None:
+            raise KeyError(f"Unknown symbol {symbol!r}")
+        dates = self.column("date")
+        start = None if start is None else _to_datetime64(start)
+        end = None if end is None else _to_datetime64(end)
+
+        slices = []
+        for offset, length in entry["segments"]:
+            segment = dates[offset:offset + length]
+            lo = 0 if start is None else int(np.searchsorted(segment, start, side="left"))
+            hi = length if end is None else int(np.searchsorted(segment, end, side="right"))
+            if hi > lo:
+                slices.append(slice(offset + lo, offset + hi))
+        return slices
+
+    def read(self, symbol: str, start=None, end=None,
+             columns: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """Column arrays for one symbol; a single-segment read is a zero-copy memmap view"""
+        columns = list(columns or COLUMNS)
+        slices = self._row_slices(symbol, start, end)
+        result = {}
+        for name in columns:
+            data = self.column(name)
+            if len(slices) == 1:
+                result[name] = data[slices[0]]
+            else:
+                result[name] = np.concatenate([data[s] for s in slices]) if slices else data[0:0]
+        return result
+
+    def read_frame(self, symbols: Iterable[str], start=None, end=None,
+                   columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Long-format DataFrame (symbol, date, ...) for one or many symbols"""
+        frames = []
+        for symbol in symbols:
+            df = pd.DataFrame(self.read(symbol, start, end, columns))
+            df.insert(0, "symbol", symbol)
+            frames.append(df)
+        if not frames:
+            return pd.DataFrame(columns=["symbol", *(columns or COLUMNS)])
+        return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export data/stocks history to a columnar .npy store')
+    parser.add_argument('--input', '-i', type=str, default='data/stocks',
+                       help='Directory with per-symbol JSON files (default: data/stocks)')
+    parser.add_argument('--output', '-o', type=str, default='data/stocks-columnar',
+                       help='Store directory (default: data/stocks-columnar)')
+    parser.add_argument('--rebuild', action='store_true', help='Discard the store and rebuild it from scratch')
+
+    args = parser.parse_args()
+
+    print(f"Exporting {args.input} to {args.output}...")
+    added = export_stocks(args.input, args.output, rebuild=args.rebuild)
+
+    store = StockColumnarStore(args.output)
+    print(f"Appended {sum(added.values())} bars for {len(added)} symbols")
+    print(f"Store: {store.index['rows']} bars, {len(store.symbols())} symbols")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,17 +4,48 @@ Bonistas.com Bond Scraper
 Scrapes bond data from bonistas.com and saves it to data/bonds.json
 """
 
+import argparse
 import requests
 from bs4 import BeautifulSoup
 import json
 import os
 from datetime import datetime
 import re
-from typing import List, Dict, Optional
+import sys
+from typing import List, Dict, Optional, Union
+
+from single_flight import SingleFlight, COALESCED_EXIT_CODE
+
+BOND_FIELDS = (
+    "id", "ticker", "name", "issuer", "maturityDate", "couponRate", "price", "currency",
+    "bcbaPrice", "mepPrice", "cclPrice", "tna", "duration", "difference", "tir", "mtir",
+    "volume", "parity", "ttir", "uptir",
+)
+
+class BondRecord:
+    """Slot-based bond used in compact mode; converted to a dict only when saving"""
+    __slots__ = BOND_FIELDS
+
+    def __init__(self, **fields):
+        for field in BOND_FIELDS:
+            setattr(self, field, fields.get(field))
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in BOND_FIELDS}
 
 class BonistasScraper:
-    def __init__(self):
+    def __init__(self, compact: bool = False):
         self.base_url = "https://bonistas.com"
+        self.compact = compact
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -32,44 +63,10 @@ class BonistasScraper:
                 print(f"[{timestamp}] Scraping {url}...")
                 response = self.session.get(url, timeout=15)
                 response.raise_for_status()
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Find all <script> tags
-                scripts = soup.find_all('script')
-                for script in scripts:
-                    if not script.string:
-                        continue
-                    # Look for JS arrays/objects with bond data
-                    # Try to find a JS array assignment, e.g. var bonos = [...] or window.__INITIAL_STATE__ = {...}
-                    # We'll look for arrays of objects with ISIN, ticker, etc.
-                    matches = re.findall(r'(\[\{[\s\S]*?\}\])', script.string)
-                    for match in matches:
-                        try:
-                            # Clean up JS to JSON (single to double quotes, remove trailing commas)
-                            json_str = match.replace("'", '"')
-                            json_str = re.sub(r',\s*([}\]])', r'\1', json_str)  # Remove trailing commas
-                            data = json.loads(json_str)
-                            # Heuristic: look for objects with 'ticker' or 'isin'
-                            for bond in data:
-                                if isinstance(bond, dict) and ('ticker' in bond or 'isin' in bond):
-                                    parsed = self.parse_bond(bond)
-                                    if parsed:
-                                        page_bonds.append(parsed)
-                        except Exception:
-                            continue
-                
-                # Fallback: try to parse tables if present
-                if not page_bonds:
-                    tables = soup.find_all('table')
-                    for table in tables:
-                        headers = [th.get_text(strip=True) for th in table.find_all('th')]
-                        for row in table.find_all('tr')[1:]:
-                            cells = [td.get_text(strip=True) for td in row.find_all('td')]
-                            if len(cells) == len(headers):
-                                bond = dict(zip(headers, cells))
-                                parsed = self.parse_bond(bond)
-                                if parsed:
-                                    page_bonds.append(parsed)
+                page_bonds = self.parse_page(response.content)
+                # Release this page's body now instead of keeping it alive
+                # through the next request
+                response = None
                 
                 # Add unique bonds from this page
                 for bond in page_bonds:
@@ -89,7 +86,53 @@ class BonistasScraper:
         print(f"[{timestamp}] Total unique bonds: {len(bonds)}")
         return bonds
 
-    def parse_bond(self, bond: dict) -> Optional[Dict]:
+    def parse_page(self, content: Union[bytes, str]) -> List[Union[Dict, BondRecord]]:
+        """Extract bonds from one page's HTML, releasing the soup before returning"""
+        page_bonds = []
+        soup = BeautifulSoup(content, 'html.parser')
+        
+        # Find all <script> tags
+        scripts = soup.find_all('script')
+        for script in scripts:
+            if not script.string:
+                continue
+            # Look for JS arrays/objects with bond data
+            # Try to find a JS array assignment, e.g. var bonos = [...] or window.__INITIAL_STATE__ = {...}
+            # We'll look for arrays of objects with ISIN, ticker, etc.
+            matches = re.findall(r'(\[\{[\s\S]*?\}\])', script.string)
+            for match in matches:
+                try:
+                    # Clean up JS to JSON (single to double quotes, remove trailing commas)
+                    json_str = match.replace("'", '"')
+                    json_str = re.sub(r',\s*([}\]])', r'\1', json_str)  # Remove trailing commas
+                    data = json.loads(json_str)
+                    # Heuristic: look for objects with 'ticker' or 'isin'
+                    for bond in data:
+                        if isinstance(bond, dict) and ('ticker' in bond or 'isin' in bond):
+                            parsed = self.parse_bond(bond)
+                            if parsed:
+                                page_bonds.append(parsed)
+                except Exception:
+                    continue
+        
+        # Fallback: try to parse tables if present
+        if not page_bonds:
+            tables = soup.find_all('table')
+            for table in tables:
+                headers = [th.get_text(strip=True) for th in table.find_all('th')]
+                for row in table.find_all('tr')[1:]:
+                    cells = [td.get_text(strip=True) for td in row.find_all('td')]
+                    if len(cells) == len(headers):
+                        bond = dict(zip(headers, cells))
+                        parsed = self.parse_bond(bond)
+                        if parsed:
+                            page_bonds.append(parsed)
+        
+        # Break the tree's reference cycles so the page is freed right away
+        soup.decompose()
+        return page_bonds
+
+    def parse_bond(self, bond: dict) -> Optional[Union[Dict, BondRecord]]:
         # Try to map the bond dict to our schema
         try:
             # Enhanced mapping for bondData entries
@@ -122,6 +165,8 @@ class BonistasScraper:
                 if parsed_bond[field] is not None:
                     parsed_bond[field] = parsed_bond[field] * 100
             
+            if self.compact:
+                return BondRecord(**parsed_bond)
             return parsed_bond
         except Exception as e:
             print(f"Error parsing bond: {e}")
@@ -139,11 +184,11 @@ class BonistasScraper:
         except Exception:
             return None
 
-    def save_bonds_data(self, bonds: List[Dict], output_path: str = "data/bonds.json"):
+    def save_bonds_data(self, bonds: List[Union[Dict, BondRecord]], output_path: str = "data/bonds.json"):
         try:
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
             data = {
-                "bonds": bonds,
+                "bonds": [b.to_dict() if isinstance(b, BondRecord) else b for b in bonds],
                 "lastUpdated": datetime.now().isoformat(),
                 "source": "bonistas.com",
                 "totalBonds": len(bonds)
@@ -157,17 +202,33 @@ class BonistasScraper:
             return False
 
 def main():
-    print("Starting Bonistas bond scraper...")
-    scraper = BonistasScraper()
-    bonds = scraper.get_bond_list()
-    if bonds:
-        success = scraper.save_bonds_data(bonds)
-        if success:
-            print("Bond scraping completed successfully!")
+    parser = argparse.ArgumentParser(description='Scrape bond data from bonistas.com')
+    parser.add_argument('--compact', action='store_true',
+                       help='Keep parsed bonds as slot records instead of dicts until saving')
+    parser.add_argument('--output', '-o', type=str, default='data/bonds.json',
+                       help='Output JSON file path (default: data/bonds.json)')
+    parser.add_argument('--lock-timeout', type=float, default=300,
+                       help='Seconds to wait for a concurrent scrape to finish (default: 300)')
+    parser.add_argument('--report-coalesced', action='store_true',
+                       help=f'Exit with code {COALESCED_EXIT_CODE} when a concurrent run\'s output was reused')
+    args = parser.parse_args()
+
+    with SingleFlight(args.output, timeout=args.lock_timeout) as flight:
+        if flight.coalesced:
+            print("Bond data was just refreshed by a concurrent run, skipping scrape.")
+            sys.exit(flight.exit_code(args.report_coalesced))
+
+        print("Starting Bonistas bond scraper...")
+        scraper = BonistasScraper(compact=args.compact)
+        bonds = scraper.get_bond_list()
+        if bonds:
+            success = scraper.save_bonds_data(bonds, args.output)
+            if success:
+                print("Bond scraping completed successfully!")
+            else:
+                print("Failed to save bond data!")
         else:
-            print("Failed to save bond data!")
-    else:
-        print("No bonds found!")
+            print("No bonds found!")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Scraper Record/Replay Harness
+Records real CAFCI and bonistas.com responses to a cassette directory, serves
+them (plus synthetic fichas) from a local stub server with configurable
+latency, errors and bandwidth, and load-tests the scrapers against it
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import cafci_tna_full
+from scrape_bonistas import BonistasScraper
+
+CASSETTE_INDEX = "index.json"
+FICHA_PATH = re.compile(r"^/fondo/(\d+)/clase/(\d+)/ficha$")
+BONISTAS_FIXTURE = "bopreal_page.html"
+
+
+def _request_key(url: str) -> str:
+    """Cassette key for a URL: path plus query, host ignored"""
+    parts = urlsplit(url)
+    return f"{parts.path}?{parts.query}" if parts.query else parts.path
+
+
+def _instrument(session, on_response):
+    """Wrap session.request so on_response(url, seconds, response_or_None) sees every call, body included"""
+    original = session.request
+
+    def timed_request(method, url, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = original(method, url, *args, **kwargs)
+        except Exception:
+            on_response(url, time.perf_counter() - start, None)
+            raise
+        on_response(url, time.perf_counter() - start, response)
+        return response
+
+    session.request = timed_request
+    return session
+
+
+# ----------------------------
+# Cassettes
+# ----------------------------
+class Cassette:
+    """Directory of recorded responses: index.json plus one body file per request"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        try:
+            with open(os.path.join(path, CASSETTE_INDEX), 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+
+    def record(self, url: str, seconds: float, response):
+        if response is None or response.status_code >= 500:
+            return
+        key = _request_key(url)
+        body_file = hashlib.sha1(key.encode("utf-8")).hexdigest() + ".bin"
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, body_file), 'wb') as f:
+            f.write(response.content)
+        with self._lock:
+            self.entries[key] = {
+                "url": url,
+                "status": response.status_code,
+                "content_type": response.headers.get("Content-Type", "application/octet-stream"),
+                "body": body_file,
+                "recorded_seconds": round(seconds, 4),
+            }
+
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, CASSETTE_INDEX), 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2, ensure_ascii=False)
+
+    def lookup(self, key: str) -> Optional[Tuple[int, str, bytes]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        with open(os.path.join(self.path, entry["body"]), 'rb') as f:
+            return entry["status"], entry["content_type"], f.read()
+
+    def ficha_ids(self) -> List[Tuple[int, int]]:
+        ids = []
+        for key in self.entries:
+            m = FICHA_PATH.match(key)
+            if m:
+                ids.append((int(m.group(1)), int(m.group(2))))
+        return ids
+
+
+def record(cassette_dir: str, pages: bool = True, fichas: bool = True):
+    """Run the real scrapers once, saving every response they receive"""
+    cassette = Cassette(cassette_dir)
+
+    if fichas:
+        original_session = cafci_tna_full._requests_session
+        cafci_tna_full._requests_session = lambda: _instrument(original_session(), cassette.record)
+        try:
+            cafci_tna_full._fetch_planilla_df(cafci_tna_full._requests_session())
+        except Exception as e:
+            print(f"[WARN] planilla -> {e}")
+        try:
+            for categoria, fondos in cafci_tna_full.CATEGORIAS.items():
+                print(f"Recording {categoria} ({len(fondos)} classes)...")
+                for nombre, (fid, cid) in fondos.items():
+                    cafci_tna_full.obtener_tna_api(fid, cid, nombre_clase_fallback=nombre)
+                    time.sleep(0.35)
+        finally:
+            cafci_tna_full._requests_session = original_session
+
+    if pages:
+        scraper = BonistasScraper()
+        _instrument(scraper.session, cassette.record)
+        scraper.get_bond_list()
+
+    cassette.save()
+    print(f"Recorded {len(cassette.entries)} responses to {cassette_dir}")
+
+
+# ----------------------------
+# Stub server
+# ----------------------------
+def synthetic_ficha(fondo_id: int, clase_id: int) -> Dict:
+    """Deterministic ficha in the shape _parse_ficha expects"""
+    rng = random.Random(fondo_id * 100003 + clase_id)
+    tna = rng.uniform(0.02, 0.45)
+    return {
+        "data": {
+            "info": {
+                "diaria": {
+                    "rendimientos": {
+                        "monthYear": {"tna": f"{tna:.4f}", "rendimiento": f"{tna / 12:.4f}"},
+                        "year": {"tna": f"{tna:.4f}", "rendimiento": f"{tna:.4f}"},
+                    }
+                }
+            }
+        }
+    }
+
+
+class StubConfig:
+    def __init__(self, cassette: Optional[Cassette] = None, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, bandwidth: Optional[float] = None,
+                 synthetic: bool = True, fixture: Optional[str] = BONISTAS_FIXTURE, seed: Optional[int] = None):
+        self.cassette = cassette
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.bandwidth = bandwidth
+        self.synthetic = synthetic
+        self.fixture = fixture
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+
+    def draw(self) -> Tuple[float, bool]:
+        """Delay in seconds and whether to inject an error for one request"""
+        with self.random_lock:
+            delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+            failed = self.random.random() < self.error_rate
+        return max(delay, 0.0), failed
+
+    def resolve(self, key: str) -> Optional[Tuple[int, str, bytes]]:
+        if self.cassette:
+            hit = self.cassette.lookup(key)
+            if hit:
+                return hit
+        m = FICHA_PATH.match(key)
+        if m and self.synthetic:
+            body = json.dumps(synthetic_ficha(int(m.group(1)), int(m.group(2)))).encode("utf-8")
+            return 200, "application/json", body
+        if key.startswith("/bonos-") and self.fixture and os.path.exists(self.fixture):
+            with open(self.fixture, 'rb') as f:
+                return 200, "text/html; charset=utf-8", f.read()
+        return None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    config: StubConfig = None
+
+    def do_GET(self):
+        delay, failed = self.config.draw()
+        if delay:
+            time.sleep(delay)
+
+        hit = None if failed else self.config.resolve(self.path)
+        if failed:
+            status, content_type, body = self.config.error_status, "text/plain", b"injected error"
+        elif hit is None:
+            status, content_type, body = 404, "text/plain", b"not recorded"
+        else:
+            status, content_type, body = hit
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self._write_throttled(body)
+
+    def _write_throttled(self, body: bytes):
+        bandwidth = self.config.bandwidth
+        if not bandwidth:
+            self.wfile.write(body)
+            return
+        chunk = 16 * 1024
+        for i in range(0, len(body), chunk):
+            piece = body[i:i + chunk]
+            self.wfile.write(piece)
+            time.sleep(len(piece) / bandwidth)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    # The default accept backlog (5) drops connections under many workers,
+    # and the client's retry delay would then dominate the measured latency
+    request_queue_size = 1024
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def start_stub_server(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> StubServer:
+    """Start the stub server on a daemon thread; port 0 picks a free port"""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config})
+    server = StubServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ----------------------------
+# Load test
+# ----------------------------
+class LatencyProbe:
+    def __init__(self):
+        self.samples: List[Tuple[str, float, Optional[int]]] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, url: str, seconds: float, response):
+        path = urlsplit(url).path
+        kind = "ficha" if FICHA_PATH.match(path) else "planilla" if path == "/pb_get" else "page"
+        with self._lock:
+            self.samples.append((kind, seconds, response.status_code if response is not None else None))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = min(max(math.ceil(pct / 100.0 * len(ordered)), 1), len(ordered))
+    return ordered[rank - 1]
+
+
+def build_classes(cassette: Optional[Cassette], count: int) -> List[Tuple[str, int, int]]:
+    """Recorded classes first, then synthetic ones until `count` classes"""
+    classes = []
+    recorded = set(cassette.ficha_ids()) if cassette else set()
+    for fondos in cafci_tna_full.CATEGORIAS.values():
+        for nombre, (fid, cid) in fondos.items():
+            if (fid, cid) in recorded:
+                classes.append((nombre, fid, cid))
+    for i in range(max(count - len(classes), 0)):
+        classes.append((f"Clase Sintetica {i}", 100000 + i // 4, 500000 + i))
+    return classes[:count]
+
+
+def load_test(base_url: str, classes: List[Tuple[str, int, int]], workers: int = 8,
+              bonistas: bool = True) -> Dict:
+    """Run the full pipeline against base_url and collect per-request latencies"""
+    probe = LatencyProbe()
+    original = (cafci_tna_full._requests_session, cafci_tna_full.FICHA_URL, cafci_tna_full.PLANILLA_URL)
+    cafci_tna_full._requests_session = lambda: _instrument(original[0](), probe)
+    cafci_tna_full.FICHA_URL = base_url + "/fondo/{fid}/clase/{cid}/ficha"
+    cafci_tna_full.PLANILLA_URL = base_url + "/pb_get"
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(
+                lambda c: cafci_tna_full.obtener_tna_api(c[1], c[2], nombre_clase_fallback=c[0]), classes))
+        bonds = []
+        if bonistas:
+            scraper = BonistasScraper()
+            scraper.base_url = base_url
+            _instrument(scraper.session, probe)
+            bonds = scraper.get_bond_list()
+    finally:
+        cafci_tna_full._requests_session, cafci_tna_full.FICHA_URL, cafci_tna_full.PLANILLA_URL = original
+    wall = time.perf_counter() - start
+
+    return {
+        "wall": wall,
+        "classes": len(classes),
+        "classes_ok": sum(1 for tna, rend in results if tna is not None or rend is not None),
+        "bonds": len(bonds),
+        "samples": probe.samples,
+    }
+
+
+def print_report(result: Dict):
+    samples = result["samples"]
+    wall = result["wall"]
+    errors = sum(1 for _, _, status in samples if status is None or status >= 400)
+    print(f"\nWall time: {wall:.2f}s")
+    print(f"Classes: {result['classes_ok']}/{result['classes']} with data, bonds: {result['bonds']}")
+    print(f"Requests: {len(samples)} ({errors} errors), throughput {len(samples) / wall:.1f} req/s, "
+          f"{result['classes'] / wall:.1f} classes/s")
+    print(f"\n{'kind':<9} {'requests':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+    kinds = ["all"] + sorted({kind for kind, _, _ in samples})
+    for kind in kinds:
+        values = [s for k, s, _ in samples if kind == "all" or k == kind]
+        print(f"{kind:<9} {len(values):>8} {percentile(values, 50) * 1000:>9.1f} "
+              f"{percentile(values, 95) * 1000:>9.1f} {percentile(values, 99) * 1000:>9.1f}")
+
+
+def _add_stub_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--cassette', '-c', type=str, default=None,
+                       help='Cassette directory to replay (default: synthetic data only)')
+    parser.add_argument('--latency', type=float, default=0.05, help='Response latency in seconds (default: 0.05)')
+    parser.add_argument('--jitter', type=float, default=0.02, help='Uniform latency jitter in seconds (default: 0.02)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail (default: 0)')
+    parser.add_argument('--error-status', type=int, default=503, help='Status of injected errors (default: 503)')
+    parser.add_argument('--bandwidth', type=float, default=None, help='Bytes per second per response (default: unlimited)')
+    parser.add_argument('--fixture', type=str, default=BONISTAS_FIXTURE,
+                       help=f'HTML served for unrecorded bonistas pages (default: {BONISTAS_FIXTURE})')
+    parser.add_argument('--no-synthetic', action='store_true', help='Do not generate fichas missing from the cassette')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for latency and error injection')
+
+
+def _stub_config(args) -> StubConfig:
+    return StubConfig(
+        cassette=Cassette(args.cassette) if args.cassette else None,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        bandwidth=args.bandwidth,
+        synthetic=not args.no_synthetic,
+        fixture=args.fixture,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record/replay harness and load test for the scrapers')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    rec = sub.add_parser('record', help='Record real CAFCI and bonistas.com responses')
+    rec.add_argument('--cassette', '-c', type=str, default='data/cassettes', help='Cassette directory (default: data/cassettes)')
+    rec.add_argument('--skip-fichas', action='store_true', help='Do not record CAFCI fichas/planilla')
+    rec.add_argument('--skip-pages', action='store_true', help='Do not record bonistas.com pages')
+
+    serve = sub.add_parser('serve', help='Run the stub server in the foreground')
+    _add_stub_arguments(serve)
+    serve.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+
+    load = sub.add_parser('loadtest', help='Run the full pipeline against a local stub server')
+    _add_stub_arguments(load)
+    load.add_argument('--classes', '-n', type=int, default=1000, help='Number of fund classes (default: 1000)')
+    load.add_argument('--workers', '-w', type=int, default=8, help='Concurrent ficha requests (default: 8)')
+    load.add_argument('--skip-pages', action='store_true', help='Do not scrape bonistas pages')
+
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record(args.cassette, pages=not args.skip_pages, fichas=not args.skip_fichas)
+        return
+
+    config = _stub_config(args)
+    if args.command == 'serve':
+        server = start_stub_server(config, port=args.port)
+        print(f"Stub server on http://127.0.0.1:{server.server_address[1]} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+
+    server = start_stub_server(config)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    classes = build_classes(config.cassette, args.classes)
+    print(f"Load test: {len(classes)} classes, {args.workers} workers, stub at {base_url}")
+    try:
+        result = load_test(base_url, classes, workers=args.workers, bonistas=not args.skip_pages)
+    finally:
+        server.shutdown()
+    print_report(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Single-Flight Refresh Lock
+Coordinates concurrent runs of a scraper that rewrites the same output file:
+the first run takes an advisory lock, later runs wait for it and reuse its
+output instead of repeating the network work
+"""
+
+import json
+import os
+import socket
+import time
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to an exclusive-create lock file
+    fcntl = None
+
+# Exit code used by entry points (with --report-coalesced) when they reused
+# the output of an in-flight run instead of refreshing it themselves
+COALESCED_EXIT_CODE = 3
+
+
+def _pid_alive(pid: int) -> bool:
+    """True if a process with this pid exists on this host"""
+    if os.name == "nt":
+        # os.kill(pid, 0) sends CTRL_C_EVENT on Windows, so query the process instead
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return kernel32.GetLastError() == 5  # ERROR_ACCESS_DENIED: exists but not ours
+        try:
+            code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+            return code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SingleFlight:
+    """
+    Context manager around `<output_path>.lock`.
+
+    On enter, blocks until the lock is free. If another run held the lock and
+    wrote the output file while we waited, `coalesced` is set and the lock is
+    released immediately; otherwise the caller owns the lock until exit and is
+    expected to refresh the output.
+    """
+
+    def __init__(self, output_path: str, lock_path: Optional[str] = None, timeout: float = 300.0,
+                 stale_after: float = 600.0, poll_interval: float = 0.5):
+        self.output_path = output_path
+        self.lock_path = lock_path or f"{output_path}.lock"
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self.coalesced = False
+        self._fd = None
+
+    def __enter__(self) -> "SingleFlight":
+        requested_at = time.time()
+        deadline = requested_at + self.timeout
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+
+        waited = False
+        while not self._try_acquire():
+            # A flock is dropped by the kernel when its holder dies, so only
+            # the exclusive-create fallback can be left behind by a dead run
+            if fcntl is None and self._is_stale():
+                print(f"[single-flight] Breaking stale lock {self.lock_path}")
+                self._break_lock()
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"Timed out after {self.timeout:.0f}s waiting for {self.lock_path}")
+            if not waited:
+                print(f"[single-flight] Refresh of {self.output_path} in progress, waiting...")
+                waited = True
+            time.sleep(self.poll_interval)
+
+        # Only reuse output produced by a run that was in flight when we asked
+        if waited and self._output_mtime() >= requested_at:
+            self.coalesced = True
+            self._release()
+            print(f"[single-flight] Reusing {self.output_path} written by a concurrent run")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._release()
+        return False
+
+    def exit_code(self, report_coalesced: bool) -> int:
+        return COALESCED_EXIT_CODE if self.coalesced and report_coalesced else 0
+
+    def _output_mtime(self) -> float:
+        try:
+            return os.stat(self.output_path).st_mtime
+        except FileNotFoundError:
+            return float("-inf")
+
+    def _try_acquire(self) -> bool:
+        if fcntl is None:
+            try:
+                self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT | os.O_EXCL)
+            except FileExistsError:
+                return False
+            self._write_owner()
+            return True
+
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+
+        # The file may have been removed (e.g. by hand) and recreated while we locked it
+        try:
+            same_file = os.fstat(fd).st_ino == os.stat(self.lock_path).st_ino
+        except FileNotFoundError:
+            same_file = False
+        if not same_file:
+            os.close(fd)
+            return False
+
+        self._fd = fd
+        self._write_owner()
+        return True
+
+    def _write_owner(self):
+        owner = {"pid": os.getpid(), "host": socket.gethostname(), "started_at": time.time()}
+        os.ftruncate(self._fd, 0)
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, json.dumps(owner).encode("utf-8"))
+        os.fsync(self._fd)
+
+    def _is_stale(self) -> bool:
+        """
+        Exclusive-create lock left behind by a run that is gone: its owner's
+        pid is dead on this host, or it has been held for longer than
+        stale_after (owner on another host, or pid reused)
+        """
+        try:
+            with open(self.lock_path, 'r', encoding='utf-8') as f:
+                owner = json.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception:
+            owner = {}
+
+        pid, host = owner.get("pid"), owner.get("host")
+        if pid is not None and host == socket.gethostname() and not _pid_alive(int(pid)):
+            return True
+
+        started_at = owner.get("started_at")
+        if started_at is None:
+            # Owner not written (holder died right after creating the file)
+            try:
+                started_at = os.stat(self.lock_path).st_mtime
+            except FileNotFoundError:
+                return False
+        return time.time() - started_at > self.stale_after
+
+    def _break_lock(self):
+        try:
+            os.unlink(self.lock_path)
+        except FileNotFoundError:
+            pass
+
+    def _release(self):
+        if self._fd is None:
+            return
+        if fcntl is not None:
+            os.ftruncate(self._fd, 0)
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        else:
+            os.close(self._fd)
+            self._break_lock()
+        self._fd = None
@@ -10,6 +10,8 @@ const PYTHON_BIN = "python"; // o "python3" según el sistema
 const PY_SCRIPT = path.join(process.cwd(), "scripts", "cafci_tna_full.py");
 const CACHE_FILE = path.join(process.cwd(), "data", "fondos_tna_rendimiento.csv");
 const CACHE_DURATION = 24 * 60 * 60 * 1000; // 24 horas en ms
+// Código de salida del script cuando reutilizó el CSV de otra corrida en curso
+const COALESCED_EXIT_CODE = 3;
 
 interface CacheInfo {
   exists: boolean;
@@ -68,7 +70,7 @@ export class CafciCache {
     console.log("🔄 Actualizando caché de CAFCI...");
     
     try {
-      const command = `${PYTHON_BIN} "${PY_SCRIPT}"`;
+      const command = `${PYTHON_BIN} "${PY_SCRIPT}" --report-coalesced`;
       const { stdout, stderr } = await execAsync(command, {
         cwd: process.cwd(),
         timeout: 300000 // 5 minutos timeout
@@ -83,6 +85,12 @@ export class CafciCache {
       this.cacheData = null; // Invalidar caché en memoria
       
     } catch (error) {
+      if ((error as { code?: number }).code === COALESCED_EXIT_CODE) {
+        console.log("✅ Caché de CAFCI actualizado por otra ejecución en curso");
+        this.lastUpdate = Date.now();
+        this.cacheData = null;
+        return;
+      }
       console.error("❌ Error actualizando caché de CAFCI:", error);
       throw new Error(`Error ejecutando script Python: ${error}`);
     }